@@ -1,5 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
+from PIL import Image
 
 # --------------------------------------------------
 # 1. Image resolution parameters
@@ -20,10 +21,10 @@ canvas = np.zeros((height, width, 3))
 # 3. Create a 2D coordinate system
 # X and Y represent pixel positions and act as input domains
 # for mathematical pattern generation (field-based thinking).
+# Open grids (shapes (1, W) and (H, 1)) broadcast against each
+# other, so no full-size coordinate arrays are materialized.
 # --------------------------------------------------
-x = np.arange(width)
-y = np.arange(height)
-X, Y = np.meshgrid(x, y)
+Y, X = np.ogrid[:height, :width]
 
 # --------------------------------------------------
 # 4. Base sine-wave fields
@@ -52,12 +53,16 @@ radial_gradient = 1 - distance_norm
 # This produces a continuous noise field that can meaningfully
 # interact with other mathematical patterns.
 # --------------------------------------------------
+# The noise is padded once with wrap-around edges; the neighbors
+# are then summed in place from views of the padded array.
 noise = np.random.rand(height, width)
-noise = (
-    noise +
-    np.roll(noise, 1, 0) + np.roll(noise, -1, 0) +
-    np.roll(noise, 1, 1) + np.roll(noise, -1, 1)
-) / 5
+padded = np.pad(noise, 1, mode='wrap')
+noise = padded[1:-1, 1:-1].copy()
+noise += padded[:-2, 1:-1]
+noise += padded[2:, 1:-1]
+noise += padded[1:-1, :-2]
+noise += padded[1:-1, 2:]
+noise /= 5
 
 # --------------------------------------------------
 # 7. Layered field composition
@@ -109,11 +114,14 @@ for i in range(n_fields):
 # 10. Save and display result
 # The image is saved for documentation and embedding
 # while still being displayed for interactive inspection.
+# The canvas is already an 8-bit RGB array, so it is written
+# directly as a PNG, one pixel per array cell, without going
+# through a Matplotlib figure. Low compression favors speed.
 # --------------------------------------------------
+Image.fromarray(canvas).save("images/layered_pattern.png", optimize=False, compress_level=1)
+
 plt.figure(figsize=(5, 5))
 plt.imshow(canvas)
 plt.axis('off')
 plt.title("Layered sine, gradient, and noise pattern")
-
-plt.savefig("images/layered_pattern.png", dpi=300, bbox_inches="tight")
 plt.show()
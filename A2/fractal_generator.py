@@ -4,64 +4,189 @@ Assignment 2: Fractal Generator
 Author: Mathias Madsen
 
 Description:
-Generates fractal trees using recursive geometric patterns with attractors.
+Generates fractal trees from self-similar branching patterns with attractors.
+Trees are grown level by level (breadth-first) over NumPy arrays.
 """
 
 import matplotlib.pyplot as plt
-import random
+from matplotlib.collections import LineCollection
+import numpy as np
 import math
 import os
-from shapely.geometry import LineString, Point
-
-def draw_branch(ax, x, y, length, angle, depth, max_depth, shrink_factor,
-                branch_angle, attractor, attractor_strength, lines, min_length=2):
-    # Stop condition: if the branch is too small or recursion depth exceeded
-    if depth > max_depth or length < min_length:
-        ax.scatter(x, y, s=20, color='green', zorder=3)  # Draw a leaf as a green dot
-        return
-
-    # Calculate the vector from current branch tip to attractor point
-    dx = attractor.x - x
-    dy = attractor.y - y
-    angle_to_attractor = math.degrees(math.atan2(dy, dx))  # Angle in degrees toward attractor
-
-    # Blend current growth angle with attractor influence
-    angle = (1 - attractor_strength) * angle + attractor_strength * angle_to_attractor
-
-    # Compute the endpoint of this branch using trigonometry
-    x2 = x + length * math.cos(math.radians(angle))
-    y2 = y + length * math.sin(math.radians(angle))
-    new_line = LineString([(x, y), (x2, y2)])  # Represent branch as a Shapely line
-
-    # Collision check: prevent this branch from crossing existing branches
-    for old_line, _ in lines:
-        if new_line.crosses(old_line):
-            return  
-
-    # Save branch line and depth for plotting and collision checking
-    lines.append((new_line, depth))
-
-    # Randomize angle slightly to give tree a natural look
-    rand_angle = random.uniform(-10, 10)
-    new_length = length * shrink_factor  # Reduce branch length for next recursion
-    # Reduce branching angle at higher depths to taper the tree
-    base_angle = branch_angle * (1 - depth / max_depth)
-
-    # Recursive calls: create left and right branches
-    draw_branch(ax, x2, y2, new_length, angle + base_angle + rand_angle, depth + 1,
-                max_depth, shrink_factor, branch_angle, attractor, attractor_strength, lines, min_length)
-    draw_branch(ax, x2, y2, new_length, angle - base_angle + rand_angle, depth + 1,
-                max_depth, shrink_factor, branch_angle, attractor, attractor_strength, lines, min_length)
+from shapely.geometry import Point
+
+# Tolerance below which two branches are treated as parallel
+PARALLEL_EPS = 1e-12
+
+# Maximum random deviation added to each branch angle (radians)
+RAND_ANGLE = math.radians(10)
+
+# Number of new branches tested against the stored ones per broadcast,
+# which bounds the size of the temporary (rows x stored) arrays
+CHUNK = 256
+
+# Most branches of a full binary tree are pruned by collisions, so at most
+# this many are reserved up front; add_segments grows the storage beyond it
+RESERVE_MAX = 1024
+
+def new_segments(capacity=256):
+    # Branch storage: one (x1, y1, x2, y2) row per branch, its bounding
+    # box (min_x, min_y, max_x, max_y) and its depth
+    return {"xy": np.empty((capacity, 4)), "box": np.empty((capacity, 4)),
+            "depth": np.empty(capacity, dtype=int), "n": 0}
+
+def reserve_segments(segs, capacity):
+    # Enlarge the storage in one step so it holds at least 'capacity' branches
+    extra = capacity - len(segs["xy"])
+    if extra > 0:
+        for key in ("xy", "box", "depth"):
+            pad = np.empty((extra,) + segs[key].shape[1:], dtype=segs[key].dtype)
+            segs[key] = np.concatenate([segs[key], pad])
+
+def add_segments(segs, xy, depth):
+    n, m = segs["n"], len(xy)
+    # Grow the arrays geometrically if they were not reserved large enough
+    while n + m > len(segs["xy"]):
+        for key in ("xy", "box", "depth"):
+            segs[key] = np.concatenate([segs[key], np.empty_like(segs[key])])
+    segs["xy"][n:n + m] = xy
+    segs["box"][n:n + m, 0:2] = np.minimum(xy[:, 0:2], xy[:, 2:4])
+    segs["box"][n:n + m, 2:4] = np.maximum(xy[:, 0:2], xy[:, 2:4])
+    segs["depth"][n:n + m] = depth
+    segs["n"] = n + m
+
+def crossing_matrix(a, b):
+    # Segments a[i] = p + t*r against b[j] = q + u*s (cross-product test);
+    # True where they cross. Segments that only touch at an endpoint
+    # (parent/child, siblings) do not count.
+    r0 = (a[:, 2] - a[:, 0])[:, None]
+    r1 = (a[:, 3] - a[:, 1])[:, None]
+    s0 = (b[:, 2] - b[:, 0])[None, :]
+    s1 = (b[:, 3] - b[:, 1])[None, :]
+    qp0 = b[None, :, 0] - a[:, 0, None]
+    qp1 = b[None, :, 1] - a[:, 1, None]
+    rxs = r0 * s1 - r1 * s0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (qp0 * s1 - qp1 * s0) / rxs
+        u = (qp0 * r1 - qp1 * r0) / rxs
+    return (np.abs(rxs) > PARALLEL_EPS) & (t > 0) & (t < 1) & (u > 0) & (u < 1)
+
+def boxes_near(box, part):
+    # Indices of the bounding boxes that overlap the bounding box of the
+    # branches in 'part'; no other branch can cross one of them
+    return np.flatnonzero((box[:, 2] >= part[:, [0, 2]].min()) & (box[:, 0] <= part[:, [0, 2]].max()) &
+                          (box[:, 3] >= part[:, [1, 3]].min()) & (box[:, 1] <= part[:, [1, 3]].max()))
+
+def crosses_existing(cand, segs):
+    # For each new branch, whether it crosses any stored branch.
+    # New branches are tested in chunks; siblings and cousins are next to
+    # each other, so a chunk covers a small part of the tree and only the
+    # stored branches near that part are tested.
+    hits = np.zeros(len(cand), dtype=bool)
+    box = segs["box"][:segs["n"]]
+    for k in range(0, len(cand), CHUNK):
+        part = cand[k:k + CHUNK]
+        near = boxes_near(box, part)
+        if near.size:
+            hits[k:k + CHUNK] = crossing_matrix(part, segs["xy"][near]).any(axis=1)
+    return hits
+
+def accept_in_order(cand):
+    # Accept new branches of the same level one by one, rejecting any that
+    # crosses an earlier accepted branch of that level. Crossing pairs
+    # (later, earlier) are found chunk by chunk and kept as index lists,
+    # so memory does not grow with the square of the level size.
+    box = np.column_stack((np.minimum(cand[:, 0:2], cand[:, 2:4]),
+                           np.maximum(cand[:, 0:2], cand[:, 2:4])))
+    later, earlier = [np.empty(0, dtype=int)], [np.empty(0, dtype=int)]
+    for k in range(0, len(cand), CHUNK):
+        part = cand[k:k + CHUNK]
+        near = boxes_near(box[:k + len(part)], part)
+        i, j = np.nonzero(crossing_matrix(part, cand[near]))
+        i, j = i + k, near[j]
+        later.append(i[j < i])
+        earlier.append(j[j < i])
+    later, earlier = np.concatenate(later), np.concatenate(earlier)
+
+    # 'later' is sorted, so each branch's earlier crossings are one slice;
+    # only branches with such crossings need to be decided one by one
+    start = np.searchsorted(later, np.arange(len(cand) + 1))
+    accepted = np.ones(len(cand), dtype=bool)
+    for k in np.unique(later):
+        accepted[k] = not accepted[earlier[start[k]:start[k + 1]]].any()
+    return accepted
+
+def draw_branch(x, y, length, angle, depth, max_depth, shrink_factor,
+                branch_angle, attractor, attractor_strength, segs, leaves, rng, min_length=2):
+    # Angles ('angle', 'branch_angle') are in radians
+
+    # Branch length and spread depend only on depth, so both are tabulated once
+    # per tree. Growth stops at the first depth that is too deep or too short.
+    # (indexed by depth - the starting depth)
+    lengths = []
+    spreads = []  # Branching angle shrinks with depth to taper the tree
+    leaf_depth = depth
+    while leaf_depth <= max_depth and length >= min_length:
+        lengths.append(length)
+        spreads.append(branch_angle * (1 - leaf_depth / max_depth))
+        length *= shrink_factor
+        leaf_depth += 1
+
+    # A full binary tree down to the stop depth bounds the number of branches;
+    # the storage for it is allocated once up front, up to RESERVE_MAX branches
+    reserve_segments(segs, segs["n"] + min(2 ** (leaf_depth - depth) - 1, RESERVE_MAX))
+
+    # The tree is grown breadth-first: every branch of one depth level is
+    # handled at once as arrays of start points and angles
+    xs, ys, angles = np.array([x]), np.array([y]), np.array([angle])
+    for d in range(depth, leaf_depth):
+        # Blend current growth angles with the angles toward the attractor
+        angles = ((1 - attractor_strength) * angles +
+                  attractor_strength * np.arctan2(attractor.y - ys, attractor.x - xs))
+
+        # Compute the endpoints of this level using trigonometry
+        cand = np.column_stack((xs, ys,
+                                xs + lengths[d - depth] * np.cos(angles),
+                                ys + lengths[d - depth] * np.sin(angles)))
+
+        # Collision check: drop branches crossing earlier levels, then
+        # branches crossing an earlier branch of this level
+        keep = ~crosses_existing(cand, segs)
+        keep[keep] = accept_in_order(cand[keep])
+        cand, angles = cand[keep], angles[keep]
+        if len(cand) == 0:
+            return
+
+        # Save branch segments and depth for plotting and collision checking
+        add_segments(segs, cand, d)
+
+        # Randomize angles slightly to give tree a natural look, then split
+        # every branch into a left and a right child
+        rand_angle = rng.uniform(-RAND_ANGLE, RAND_ANGLE, size=len(cand))
+        angles = np.column_stack((angles + spreads[d - depth] + rand_angle,
+                                  angles - spreads[d - depth] + rand_angle)).ravel()
+        xs = np.repeat(cand[:, 2], 2)
+        ys = np.repeat(cand[:, 3], 2)
+
+    # Branches that reached the stop depth end in leaves
+    leaves.append(np.column_stack((xs, ys)))
 
 def draw_tree(title, start_point=(0, -200), initial_angle=90, initial_length=100,
               shrink_factor=0.7, branch_angle=25, max_depth=10, seed=42,
-              attractor=Point(100, 100), attractor_strength=0.5, min_length=2):
-    # Seed random number generator for reproducibility of fractal pattern
-    random.seed(seed)
-    lines = []  # Store all branches for plotting and collision detection
-
-    # Set up Matplotlib figure and axis
-    fig, ax = plt.subplots(figsize=(6, 8))
+              attractor=Point(100, 100), attractor_strength=0.5, min_length=2, ax=None):
+    # Seeded random number generator for reproducibility of fractal pattern
+    rng = np.random.default_rng(seed)
+    segs = new_segments()  # Store all branches for plotting and collision detection
+    leaves = []            # Store leaf positions for plotting
+
+    # Set up Matplotlib figure and axis; a passed-in axis is cleared and
+    # reused, which avoids building and tearing down a figure per tree
+    owns_figure = ax is None
+    if owns_figure:
+        fig, ax = plt.subplots(figsize=(6, 8))
+    else:
+        fig = ax.figure
+        ax.cla()
     ax.set_aspect('equal')  # Equal scaling on both axes
     ax.axis('off')           # Hide axes
     ax.set_title(title)      # Title for the tree
@@ -69,33 +194,44 @@ def draw_tree(title, start_point=(0, -200), initial_angle=90, initial_length=100
     # Draw attractor as a red dot for visual reference
     ax.scatter(attractor.x, attractor.y, s=50, color='red', zorder=4)
 
-    # Start recursive branch drawing from root point
-    draw_branch(ax, start_point[0], start_point[1], initial_length, initial_angle,
-                0, max_depth, shrink_factor, branch_angle, attractor, attractor_strength, lines, min_length)
+    # Grow all branches from root point
+    # Angles are given in degrees but grown in radians
+    draw_branch(start_point[0], start_point[1], initial_length, math.radians(initial_angle),
+                0, max_depth, shrink_factor, math.radians(branch_angle), attractor, attractor_strength,
+                segs, leaves, rng, min_length)
+
+    # Draw all branches as one collection, with thickness scaled based on depth
+    n = segs["n"]
+    segments = segs["xy"][:n].reshape(n, 2, 2)
+    linewidths = np.maximum(0.5, (max_depth - segs["depth"][:n] + 1) * 0.6)  # Older branches thicker
+    ax.add_collection(LineCollection(segments, colors='saddlebrown', linewidths=linewidths, zorder=2))
 
-    # Draw all branches, with thickness scaled based on depth
-    for line, depth in lines:
-        x, y = line.xy
-        color = 'saddlebrown'  # Brown color for trunk and branches
-        linewidth = max(0.5, (max_depth - depth + 1) * 0.6)  # Older branches thicker
-        ax.plot(x, y, color=color, linewidth=linewidth, zorder=2)
+    # Draw all leaves as green dots in a single scatter
+    if leaves:
+        leaves_xy = np.concatenate(leaves)
+        ax.scatter(leaves_xy[:, 0], leaves_xy[:, 1], s=20, color='green', zorder=3)
 
     # Fixed axis limits to make tree sizes comparable across different plots
     ax.set_xlim(-150, 250)
     ax.set_ylim(-200, 200)
 
-    plt.tight_layout()  # Adjust layout
+    fig.tight_layout()  # Adjust layout once; axis limits are fixed above
 
     # Save figure automatically in 'images/' directory
     os.makedirs("images", exist_ok=True)
     filename = title.replace(" ", "_") + ".png"
     filepath = os.path.join("images", filename)
-    plt.savefig(filepath, dpi=300, bbox_inches="tight")
+    # No bbox_inches="tight": it renders the figure twice per save.
+    # Low PNG compression trades file size for faster encoding.
+    fig.savefig(filepath, dpi=150, pil_kwargs={"compress_level": 1})
     print(f"Saved: {filepath}")
-    plt.close(fig)
-
-# Draw four trees with varying parameters and attractor positions
-draw_tree("Tree 1", branch_angle=25, max_depth=10, seed=42, attractor=Point(50, 190), min_length=2)
-draw_tree("Tree 2", branch_angle=30, max_depth=12, seed=99, attractor=Point(-100, 150), min_length=2)
-draw_tree("Tree 3", branch_angle=20, shrink_factor=0.65, max_depth=10, seed=123, attractor=Point(0, 185), min_length=2)
-draw_tree("Tree 4", branch_angle=35, max_depth=14, seed=2024, attractor=Point(220, 0), min_length=2)
+    if owns_figure:
+        plt.close(fig)
+
+# Draw four trees with varying parameters and attractor positions on one shared figure
+fig, ax = plt.subplots(figsize=(6, 8))
+draw_tree("Tree 1", branch_angle=25, max_depth=10, seed=42, attractor=Point(50, 190), min_length=2, ax=ax)
+draw_tree("Tree 2", branch_angle=30, max_depth=12, seed=99, attractor=Point(-100, 150), min_length=2, ax=ax)
+draw_tree("Tree 3", branch_angle=20, shrink_factor=0.65, max_depth=10, seed=123, attractor=Point(0, 185), min_length=2, ax=ax)
+draw_tree("Tree 4", branch_angle=35, max_depth=14, seed=2024, attractor=Point(220, 0), min_length=2, ax=ax)
+plt.close(fig)
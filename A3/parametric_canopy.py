@@ -6,7 +6,9 @@ Author: Mathias
 """
 
 import rhinoscriptsyntax as rs      
+import Rhino.Geometry as rg
 import random, math, numpy as np   
+from collections import defaultdict
 
 # -----------------------------
 # Globals (variables used everywhere)
@@ -17,6 +19,7 @@ Lines, AllPoints, Widths = [], [], []  # Store branches, endpoints, and thicknes
 Faces_quad, Faces_tri, Faces_diagrid = [], [], []  # Store tessellation panels (different styles)
 Attractor = [0, 0, 100]  # Pull vector for branches: z=100 ensures upward bias toward canopy
 safety_distance = 0.1    # Minimum spacing between branch endpoints to prevent overlap
+PointGrid = defaultdict(list)  # Spatial hash of AllPoints: cell (ix,iy,iz) -> points in that cell
 DISP = None              # Will hold height offsets (displacement field) for canopy surface
 DU0 = DU1 = DV0 = DV1 = 0.0  # Initialize surface domain variables (updated when surface is sampled)
 
@@ -24,22 +27,43 @@ DU0 = DU1 = DV0 = DV1 = 0.0  # Initialize surface domain variables (updated when
 # Helper functions
 # -----------------------------
 
-# Compute Euclidean distance between two 3D points.
-# Formula: sqrt((x1-x2)^2 + (y1-y2)^2 + (z1-z2)^2).
-def distance(p1, p2):
-    return math.sqrt(sum((p1[i] - p2[i]) ** 2 for i in range(3)))
+# Map a point to its spatial-hash cell. Cells are cubes with side safety_distance,
+# so any point closer than safety_distance lies in the same or a neighboring cell.
+def _cell(pt):
+    return (int(math.floor(pt[0] / safety_distance)),
+            int(math.floor(pt[1] / safety_distance)),
+            int(math.floor(pt[2] / safety_distance)))
+
+# Store an endpoint in AllPoints and in the spatial hash.
+def add_point(pt):
+    AllPoints.append(pt)
+    PointGrid[_cell(pt)].append(pt)
 
 # Check if a candidate point is far enough from all existing points.
 # Ensures minimum spacing (safety_distance) to prevent overlapping branches.
+# Only the 27 cells around the candidate are searched instead of all points,
+# and squared distances are compared so no sqrt is needed.
 def can_grow(pt):
-    return all(distance(pt, p) >= safety_distance for p in AllPoints)
+    x, y, z = pt[0], pt[1], pt[2]
+    safety_sq = safety_distance * safety_distance
+    ci, cj, ck = _cell(pt)
+    for di in (-1, 0, 1):
+        for dj in (-1, 0, 1):
+            for dk in (-1, 0, 1):
+                for p in PointGrid.get((ci + di, cj + dj, ck + dk), ()):
+                    dx, dy, dz = x - p[0], y - p[1], z - p[2]
+                    if dx*dx + dy*dy + dz*dz < safety_sq:
+                        return False
+    return True
 
 # -----------------------------
 # Bilinear displacement lookup
 # -----------------------------
 
 # This function interpolates displacement values (height offsets) on the canopy surface.
-# The canopy surface is sampled into a grid with displacement values stored in 'disp'.
+# The canopy surface is sampled into a grid with displacement values stored in 'disp'
+# (nested lists of floats: plain list indexing avoids boxing a NumPy scalar per corner,
+# which matters because this is called for every snapped branch endpoint).
 # Given a point (u,v) in surface parameter space:
 #   - Normalize u,v into grid coordinates (s,t).
 #   - Clamp values to avoid going outside the grid.
@@ -55,13 +79,33 @@ def _bilinear_disp(u, v, disp, du0, du1, dv0, dv1, U, V):
     t = (v - dv0) / max(1e-9, (dv1 - dv0)) * V
     s = max(0, min(U - 1e-6, s))  # clamp to grid range
     t = max(0, min(V - 1e-6, t))
-    i, j = int(math.floor(s)), int(math.floor(t))
+    i, j = int(s), int(t)  # s,t >= 0 after clamping, so int() == floor()
     a, b = s - i, t - j
-    d00, d10 = float(disp[i, j]), float(disp[i + 1, j])
-    
-    d01, d11 = float(disp[i, j + 1]), float(disp[i + 1, j + 1])
+    row0, row1 = disp[i], disp[i + 1]
+    d00, d10 = row0[j], row1[j]
+    d01, d11 = row0[j + 1], row1[j + 1]
     return (1 - a) * (1 - b) * d00 + a * (1 - b) * d10 + (1 - a) * b * d01 + a * b * d11
 
+# -----------------------------
+# Surface point + normal evaluation
+# -----------------------------
+
+# Evaluate a point and its unit normal on a RhinoCommon surface in one call.
+# Surface.Evaluate(u,v,1) returns the point and the first derivatives (du, dv);
+# the normal is their cross product. This replaces separate rs.EvaluateSurface
+# and rs.SurfaceNormal calls, which each go through the rhinoscriptsyntax layer.
+# Like rs.SurfaceNormal, the normal is flipped on a reversed Brep face, so the
+# displacement stays on the same side of the canopy.
+# Falls back to the Z-axis where the normal is undefined.
+def _point_and_normal(srf_geom, u, v):
+    ok, pt, ders = srf_geom.Evaluate(u, v, 1)
+    n = rg.Vector3d.CrossProduct(ders[0], ders[1]) if ok else rg.Vector3d.Zero
+    if not n.Unitize():
+        n = rg.Vector3d(0, 0, 1)
+    elif isinstance(srf_geom, rg.BrepFace) and srf_geom.OrientationIsReversed:
+        n = -n
+    return pt, n
+
 # -----------------------------
 # Force branch to snap to canopy surface
 # -----------------------------
@@ -73,7 +117,7 @@ def _bilinear_disp(u, v, disp, du0, du1, dv0, dv1, U, V):
 # 3. If intersection exists:
 #    - Get intersection point.
 #    - Find closest (u,v) parameters on surface.
-#    - Evaluate surface point and normal.
+#    - Evaluate surface point and normal (one Surface.Evaluate call).
 #    - Compute displacement using _bilinear_disp.
 #    - Offset surface point along normal by displacement.
 # 4. If no intersection:
@@ -82,23 +126,17 @@ def _bilinear_disp(u, v, disp, du0, du1, dv0, dv1, U, V):
 #    - Apply displacement along normal.
 # Returns the snapped endpoint on canopy surface.
 def force_branch_to_canopy(start_pt, end_pt, srf, disp, du0, du1, dv0, dv1, U, V):
+    srf_geom = rs.coercesurface(srf)
     crv = rs.AddLine(start_pt, end_pt)  # temporary line
     inters = rs.CurveSurfaceIntersection(crv, srf)
     rs.DeleteObject(crv)  # clean up
-    if inters:
-        pts = [i[1] for i in inters if i[0] == 1]
-        if pts:
-            u, v = rs.SurfaceClosestPoint(srf, pts[0])
-            base_pt = rs.EvaluateSurface(srf, u, v)
-            n = rs.SurfaceNormal(srf, (u, v)) or [0,0,1]
-            d = _bilinear_disp(u, v, disp, du0, du1, dv0, dv1, U, V)
-            return rs.PointAdd(base_pt, rs.VectorScale(n, d))
-    # fallback: project endpoint directly
-    u, v = rs.SurfaceClosestPoint(srf, end_pt)
-    base_pt = rs.EvaluateSurface(srf, u, v)
-    n = rs.SurfaceNormal(srf, (u, v)) or [0,0,1]
+    pts = [i[1] for i in inters if i[0] == 1] if inters else []
+    # snap the intersection point, or fall back to projecting the endpoint directly
+    target = pts[0] if pts else end_pt
+    ok, u, v = srf_geom.ClosestPoint(rs.coerce3dpoint(target))
+    base_pt, n = _point_and_normal(srf_geom, u, v)
     d = _bilinear_disp(u, v, disp, du0, du1, dv0, dv1, U, V)
-    return rs.PointAdd(base_pt, rs.VectorScale(n, d))
+    return base_pt + n * d
 
 # -----------------------------
 # Recursive branch growth
@@ -127,6 +165,7 @@ def force_branch_to_canopy(start_pt, end_pt, srf, disp, du0, du1, dv0, dv1, U, V
 #    - Compute vector from current point toward global Attractor (0,0,100).
 #    - Normalize it to unit length.
 #    - This biases branches upward toward canopy.
+#    - Its 15% share of the blend (step 6c) is scaled once, before the loop.
 #
 # 6. Child branches loop:
 #    - For each child branch (number defined by 'branches'):
@@ -167,11 +206,12 @@ def Grow(pt, v, depth, srf, step_z):
     rand_pt = rs.EvaluatePlane(plane, [random.uniform(-1,1), random.uniform(-1,1)])  # random offset
     rot_axis = rs.VectorCreate(rand_pt, pt)  # rotation axis
     attractor_vec = rs.VectorUnitize(rs.VectorCreate(Attractor, pt))  # upward bias vector
+    scaled_att = rs.VectorScale(attractor_vec, 0.15)  # attractor share of the blend, same for every child
 
     for _ in range(branches):  # loop over child branches
         tilt = random.uniform(-angle, angle) + random.uniform(-angle_variation, angle_variation)
         Vb = rs.VectorRotate(v, tilt, rot_axis)  # rotate branch direction
-        Vb = rs.VectorUnitize(rs.VectorAdd(rs.VectorScale(Vb,0.85), rs.VectorScale(attractor_vec,0.15)))  # blend with attractor
+        Vb = rs.VectorUnitize(rs.VectorAdd(rs.VectorScale(Vb,0.85), scaled_att))  # blend with attractor
         scale = step_z / max(1e-9, abs(Vb[2]))  # adjust length to match vertical step
         end_pt = rs.PointAdd(pt, rs.VectorScale(Vb, scale))  # compute endpoint
 
@@ -188,7 +228,7 @@ def Grow(pt, v, depth, srf, step_z):
 
         crv = rs.AddCurve([pt, mid, snap_pt], degree=2)  # quadratic curve
         Lines.append(crv)        # store curve
-        AllPoints.append(snap_pt) # store endpoint
+        add_point(snap_pt)        # store endpoint
         Widths.append(2 + depth)  # thickness increases with depth
 
         Grow(snap_pt, Vb, depth+1, srf, step_z)  # recursive call
@@ -220,15 +260,16 @@ def Grow(pt, v, depth, srf, step_z):
 #    - phase shifts the wave pattern.
 #
 # 5. Evaluate displaced points:
-#    - For each grid point (u,v):
-#      a. Evaluate surface point at (u,v).
-#      b. Get surface normal at (u,v).
-#      c. Offset point along normal by displacement value.
-#    - Store displaced points in list 'pts'.
+#    - For each grid point (u,v), in one flat loop over the raveled grid:
+#      a. Evaluate surface point at (u,v) into array 'base_arr'.
+#      b. Get surface normal at (u,v) into array 'norm_arr'
+#         (both from a single RhinoCommon Surface.Evaluate call).
+#    - Offset all points along their normals in one vectorized step:
+#      pts_arr = base_arr + norm_arr * disp.
 #
 # 6. Return results:
-#    - pts → list of displaced canopy points.
-#    - disp → displacement grid (used later for snapping branches).
+#    - pts → list of displaced canopy points (converted from pts_arr).
+#    - disp → displacement grid as nested float lists (used later for snapping branches).
 def sample_surface(srf, U, V, amp, freq, phase):
     du0, du1 = rs.SurfaceDomain(srf,0)
     dv0, dv1 = rs.SurfaceDomain(srf,1)
@@ -236,14 +277,17 @@ def sample_surface(srf, U, V, amp, freq, phase):
     DU0, DU1, DV0, DV1 = du0, du1, dv0, dv1
     UU, VV = np.meshgrid(np.linspace(du0, du1, U+1), np.linspace(dv0, dv1, V+1), indexing='ij')
     disp = amp * np.sin(freq * UU * math.pi + phase) * np.cos(freq * VV * math.pi + phase)
-    pts = []
-    for i in range(U+1):
-        for j in range(V+1):
-            u, v = float(UU[i,j]), float(VV[i,j])
-            pt = rs.EvaluateSurface(srf,u,v)
-            n = rs.SurfaceNormal(srf,(u,v)) or [0,0,1]
-            pts.append(rs.PointAdd(pt, rs.VectorScale(n, disp[i,j])))
-    return pts, disp
+    srf_geom = rs.coercesurface(srf)
+    uu, vv = UU.ravel(), VV.ravel()  # row-major: index i*(V+1) + j
+    base_arr = np.empty((uu.size, 3))
+    norm_arr = np.empty((uu.size, 3))
+    for k in range(uu.size):
+        pt, n = _point_and_normal(srf_geom, float(uu[k]), float(vv[k]))
+        base_arr[k] = (pt.X, pt.Y, pt.Z)
+        norm_arr[k] = (n.X, n.Y, n.Z)
+    pts_arr = base_arr + norm_arr * disp.reshape(-1, 1)
+    # (U+1) x (V+1) grid of points, converted to lists once
+    return pts_arr.reshape(U+1, V+1, 3).tolist(), disp.tolist()
 
 # -----------------------------
 # Create base canopy surface
@@ -270,7 +314,8 @@ pts_surface, DISP = sample_surface(base_srf, U, V, hm_amp, hm_freq, hm_phase)
 #   p2 = bottom-right corner
 #   p3 = bottom-left corner
 #
-# For each cell, i construct three different tessellation styles:
+# For each cell, i construct one of three tessellation styles, selected by tess_mode
+# (only the requested style is built, so no unused polylines are added to the document):
 #
 # 1. Quad tessellation:
 #    - A closed polyline through the four corners (p0 → p1 → p2 → p3 → back to p0).
@@ -287,21 +332,24 @@ pts_surface, DISP = sample_surface(base_srf, U, V, hm_amp, hm_freq, hm_phase)
 #    - Polyline order: p0 → p2 → p3 → p1 → back to p0.
 #    - This produces a diamond-shaped lattice, often used for structural or aesthetic purposes.
 #
-# Each tessellation type is stored in its own list:
+# Each tessellation type is stored in its own list (the unselected ones stay empty):
 #   - Faces_quad → all quad panels
 #   - Faces_tri → all triangular panels
 #   - Faces_diagrid → all diagrid panels
 #
-# Later, the I can choose which tessellation style to output by setting tess_mode.
+# pts_surface is already a (U+1) x (V+1) grid, so corners are looked up
+# by (i,j) instead of i*(V+1)+j offsets.
 for i in range(U):
+    row0, row1 = pts_surface[i], pts_surface[i+1]
     for j in range(V):
-        p0 = pts_surface[i*(V+1) + j]
-        p1 = pts_surface[i*(V+1) + j+1]
-        p2 = pts_surface[(i+1)*(V+1) + j+1]
-        p3 = pts_surface[(i+1)*(V+1) + j]
-        Faces_quad.append(rs.AddPolyline([p0,p1,p2,p3,p0]))
-        Faces_tri.extend([rs.AddPolyline([p0,p1,p2,p0]), rs.AddPolyline([p0,p2,p3,p0])])
-        Faces_diagrid.append(rs.AddPolyline([p0,p2,p3,p1,p0]))
+        p0, p1 = row0[j], row0[j+1]
+        p2, p3 = row1[j+1], row1[j]
+        if tess_mode == 0:
+            Faces_quad.append(rs.AddPolyline([p0,p1,p2,p3,p0]))
+        elif tess_mode == 1:
+            Faces_tri.extend([rs.AddPolyline([p0,p1,p2,p0]), rs.AddPolyline([p0,p2,p3,p0])])
+        else:
+            Faces_diagrid.append(rs.AddPolyline([p0,p2,p3,p1,p0]))
 
 # -----------------------------
 # Grow tree trunks + recursive branches
@@ -332,7 +380,7 @@ for ix in range(countX):
         B = rs.PointAdd(A, rs.VectorScale(Vvec, L))
         Lines.append(rs.AddLine(A,B))
         Widths.append(4)
-        AllPoints.append(B)
+        add_point(B)
         u, v_srf = rs.SurfaceClosestPoint(base_srf, B)
         canopy_pt = rs.EvaluateSurface(base_srf, u, v_srf)
         step_z = abs(canopy_pt[2]-B[2]) / max(gen,1)
@@ -15,9 +15,129 @@ maintaining agent state between solutions.
 
 import Grasshopper
 import random
+import numpy as np
 import rhinoscriptsyntax as rs
 import Rhino
-import Rhino.Geometry as rg
+
+# SciPy is optional: with it, the NumPy step finds neighbors of large
+# swarms with a KD-tree instead of the spatial hash
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# Default neighborhood radius in UV-space; also the cell size of the
+# spatial hash used for neighbor queries
+NEIGHBOR_RADIUS = 0.05
+
+# Largest population for which AgentSwarm finds neighbors through a full
+# N x N distance matrix; larger ones use the spatial hash, since the
+# matrix costs O(N^2) time and memory
+DENSE_MAX_AGENTS = 400
+
+# ============================================================
+# SPATIAL HASH
+# ============================================================
+
+def build_uv_hash(agents, cell, grid=None):
+    """
+    Bin agents into a uniform grid over UV-space.
+
+    With ``cell`` equal to the neighborhood radius, every neighbor of an
+    agent lies in the agent's own cell or one of the 8 cells around it.
+
+    Parameters
+    ----------
+    agents : list[GeoAgent]
+        All agents in the simulation.
+    cell : float
+        Cell size in UV-space.
+    grid : dict, optional
+        Hash from a previous frame; it is cleared and refilled to
+        avoid allocating a new dict every frame.
+
+    Returns
+    -------
+    dict[(int, int), list[GeoAgent]]
+        Agents keyed by their (u, v) cell.
+    """
+    if grid is None:
+        grid = {}
+    else:
+        grid.clear()
+
+    for a in agents:
+        key = (int(a.u / cell), int(a.v / cell))
+        bucket = grid.get(key)
+        if bucket is None:
+            grid[key] = [a]
+        else:
+            bucket.append(a)
+
+    return grid
+
+def build_cell_index(u, v, cell, n_cu, n_cv, xp=np):
+    """
+    Bin agent arrays into a uniform UV grid stored as flat arrays.
+
+    Cell ``c = ci * n_cv + cj`` holds the agents
+    ``order[cell_start[c]:cell_start[c + 1]]``.
+
+    Parameters
+    ----------
+    u, v : ndarray[float]
+        Agent UV coordinates, measured from the start of the surface
+        domain.
+    cell : float
+        Cell size in UV-space.
+    n_cu, n_cv : int
+        Number of cells in U and V.
+    xp : module
+        Array module of u and v (default NumPy).
+
+    Returns
+    -------
+    cell_start : ndarray[int]
+        Offset of each cell in order (length n_cu * n_cv + 1).
+    order : ndarray[int]
+        Agent indices sorted by cell.
+    """
+    cell_id = (u / cell).astype(np.intp) * n_cv + (v / cell).astype(np.intp)
+    order = xp.argsort(cell_id, kind="stable")
+    cell_start = xp.searchsorted(cell_id[order], xp.arange(n_cu * n_cv + 1))
+    return cell_start, order
+
+# ============================================================
+# FIELD PACKING
+# ============================================================
+
+def pack_fields(curvature, slope_mag, slope_vec):
+    """
+    Pack the UV-aligned fields into one contiguous array.
+
+    The four values an agent samples at one grid cell sit next to each
+    other in memory and are read together. The X and Y components of
+    the slope directions are read from the Vector3d objects once, here,
+    instead of on every sample.
+
+    Parameters
+    ----------
+    curvature, slope_mag : list[list[float]]
+        Normalized Gaussian curvature and slope magnitude.
+    slope_vec : list[list[Vector3d]]
+        Downhill directions.
+
+    Returns
+    -------
+    ndarray, shape (rows, cols, 4), float32
+        Per cell: curvature, slope magnitude, slope X, slope Y.
+    """
+    fields = np.zeros((len(curvature), len(curvature[0]), 4), dtype=np.float32)
+    fields[:, :, 0] = curvature
+    fields[:, :, 1] = slope_mag
+    fields[:, :, 2] = [[vec.X for vec in row] for row in slope_vec]
+    fields[:, :, 3] = [[vec.Y for vec in row] for row in slope_vec]
+    return fields
 
 # ============================================================
 # GEOAGENT CLASS
@@ -33,8 +153,13 @@ class GeoAgent(object):
     projected back onto the surface for 3D position output.
     """
 
+    # Fixed attribute set: no per-instance __dict__, faster attribute access
+    __slots__ = ("u", "v", "vx", "vy", "position",
+                 "surface", "dom_u", "dom_v",
+                 "uv_grid", "fields", "_nu", "_nv")
+
     def __init__(self, u, v, surface, dom_u, dom_v,
-                 uv_grid, curvature_field, slope_mag, slope_vec):
+                 uv_grid, fields, velocity=None, position=None):
         """
         Initialize a GeoAgent instance.
 
@@ -48,12 +173,14 @@ class GeoAgent(object):
             Parameter domains of the surface in U and V.
         uv_grid : list[list[Point2d]]
             UV sampling grid used for field indexing.
-        curvature_field : list[list[float]]
-            Scalar curvature field aligned to uv_grid.
-        slope_mag : list[list[float]]
-            Scalar slope magnitude field.
-        slope_vec : list[list[Vector3d]]
-            Directional slope vectors aligned to uv_grid.
+        fields : list[list[list[float]]] or ndarray
+            Fields aligned to uv_grid, indexed [v_idx][u_idx]. Each
+            entry holds (curvature, slope magnitude, slope X, slope Y).
+        velocity : (float, float), optional
+            Initial UV velocity. A small random perturbation if omitted.
+        position : Rhino.Geometry.Point3d, optional
+            3D position at (u, v), if already evaluated (see
+            evaluate_positions). Evaluated from the surface if omitted.
         """
 
         # --- Parametric state
@@ -67,190 +194,160 @@ class GeoAgent(object):
 
         # --- Field data
         self.uv_grid = uv_grid
-        self.curvature_field = curvature_field
-        self.slope_mag = slope_mag
-        self.slope_vec = slope_vec
+        self.fields = fields
 
-        # --- Initial 3D position evaluated from UV
-        pt = rs.EvaluateSurface(surface, u, v)
-        self.position = (pt.X, pt.Y, pt.Z)
+        # --- Grid indices per unit of U and V, used to map UV measured
+        # from the start of the domain to indices
+        self._nu = (len(uv_grid[0]) - 1) / (dom_u[1] - dom_u[0])
+        self._nv = (len(uv_grid) - 1) / (dom_v[1] - dom_v[0])
+
+        # --- Initial 3D position evaluated from UV (kept as a Point3d,
+        # so it can be output without building a new point)
+        if position is None:
+            position = surface.PointAt(u, v)
+        self.position = position
 
         # --- Initial UV velocity (small random perturbation)
-        self.velocity = [
-            random.uniform(-0.01, 0.01),
-            random.uniform(-0.01, 0.01)
-        ]
+        if velocity is None:
+            self.vx = random.uniform(-0.01, 0.01)
+            self.vy = random.uniform(-0.01, 0.01)
+        else:
+            self.vx, self.vy = velocity
 
     # ============================================================
     # FIELD SAMPLING
     # ============================================================
 
-    def _sample_indices(self):
+    def _field_sample(self):
         """
-        Convert continuous UV coordinates to discrete grid indices.
+        Sample curvature and slope fields at the agent's current location.
 
-        Returns
-        -------
-        (int, int)
-            Indices for accessing UV-aligned field grids.
-        """
-        u_idx = int(self.u * (len(self.uv_grid[0]) - 1))
-        v_idx = int(self.v * (len(self.uv_grid) - 1))
-        return u_idx, v_idx
-
-    def _curvature_force(self):
-        """
-        Sample curvature field at the agent's current location.
-
-        Curvature is treated as a non-directional influence that
-        damps velocity magnitude in regions of high curvature.
+        Continuous UV coordinates are converted to grid indices once,
+        and all fields are read at those indices. Curvature is treated
+        as a non-directional influence that damps velocity magnitude in
+        regions of high curvature; slope gives a directional force.
 
         Returns
         -------
-        force : list[float]
-            Zero directional force (curvature has no direction).
         speed_scale : float
             Multiplicative damping factor applied to velocity.
+        fx, fy : float
+            Slope force in UV-space.
         """
-        u_idx, v_idx = self._sample_indices()
-        c = self.curvature_field[v_idx][u_idx]
-
-        speed_scale = 1.0 - c
-        return [0.0, 0.0], speed_scale
-
-    def _slope_force(self):
-        """
-        Sample slope magnitude and direction at the agent's position.
-
-        Returns
-        -------
-        list[float]
-            Directional force vector in UV-space.
-        """
-        u_idx, v_idx = self._sample_indices()
-        mag = self.slope_mag[v_idx][u_idx]
-        vec = self.slope_vec[v_idx][u_idx]
-
-        return [vec.X * mag, vec.Y * mag]
+        u_idx = int((self.u - self.dom_u[0]) * self._nu)
+        v_idx = int((self.v - self.dom_v[0]) * self._nv)
+        c, mag, sx, sy = self.fields[v_idx][u_idx]
+        return 1.0 - c, sx * mag, sy * mag
 
     # ============================================================
     # BOID-STYLE NEIGHBOR FORCES
     # ============================================================
 
-    def _dist_uv(self, other):
+    def _boid_forces(self, agents, grid, cell, radius, separation_radius=0.05):
         """
-        Compute Euclidean distance to another agent in UV-space.
-        """
-        return ((self.u - other.u)**2 + (self.v - other.v)**2) ** 0.5
+        Compute separation, cohesion and alignment in one pass over the
+        neighbors.
 
-    def _neighbors_in_radius(self, others, radius):
-        """
-        Collect all agents within a given UV radius.
+        With a spatial hash, only the 3x3 block of cells around the agent
+        is searched; without one, all agents are. Squared distances are
+        compared to avoid a square root for agents out of range. The sums
+        for all three forces are accumulated while visiting each neighbor
+        once, without collecting a list.
+
+        - Separation pushes away from nearby agents, stronger when
+          closer, preventing clustering and overlap.
+        - Cohesion points toward the neighbor centroid.
+        - Alignment points along the average neighbor velocity.
 
         Parameters
         ----------
-        others : list[GeoAgent]
+        agents : list[GeoAgent]
             All agents in the simulation.
+        grid : dict[(int, int), list[GeoAgent]] or None
+            Spatial hash of ``agents`` built by build_uv_hash.
+        cell : float
+            Cell size the hash was built with (>= radius).
         radius : float
             Neighborhood radius in UV-space.
 
         Returns
         -------
-        list[GeoAgent]
-            Nearby agents excluding self.
-        """
-        neighbors = []
-        for other in others:
-            if other is self:
-                continue
-            if self._dist_uv(other) < radius:
-                neighbors.append(other)
-        return neighbors
-
-    def _separation_force(self, neighbors, separation_radius=0.05):
-        """
-        Compute repulsive force away from nearby agents.
-
-        The force magnitude increases as agents get closer,
-        preventing clustering and overlap.
-
-        Returns
-        -------
-        list[float]
-            Separation steering vector in UV-space.
-        """
-        steer = [0.0, 0.0]
-        if not neighbors:
-            return steer
-
-        for other in neighbors:
-            vec = [self.u - other.u, self.v - other.v]
-            d = (vec[0]**2 + vec[1]**2) ** 0.5
-
-            if d == 0:
-                vec = [random.uniform(-1, 1), random.uniform(-1, 1)]
-                d = (vec[0]**2 + vec[1]**2) ** 0.5
-
-            inv_t = 1 - min(d / separation_radius, 1)
-            vec = [vec[0]/d * inv_t, vec[1]/d * inv_t]
-
-            steer[0] += vec[0]
-            steer[1] += vec[1]
-
-        return steer
-
-    def _cohesion_force(self, neighbors):
-        """
-        Compute attraction force toward the local neighbor centroid.
-
-        Returns
-        -------
-        list[float]
-            Normalized cohesion direction in UV-space.
+        tuple[float]
+            sep_u, sep_v, coh_u, coh_v, ali_u, ali_v in UV-space;
+            cohesion and alignment are normalized. All zero if the
+            agent has no neighbors.
         """
-        if not neighbors:
-            return [0.0, 0.0]
-
-        center_u = sum([o.u for o in neighbors]) / len(neighbors)
-        center_v = sum([o.v for o in neighbors]) / len(neighbors)
-
-        vec = [center_u - self.u, center_v - self.v]
-        length = (vec[0]**2 + vec[1]**2) ** 0.5
-
+        if grid is None:
+            buckets = (agents,)
+        else:
+            ci = int(self.u / cell)
+            cj = int(self.v / cell)
+            buckets = [grid.get((ci + di, cj + dj), ())
+                       for di in (-1, 0, 1) for dj in (-1, 0, 1)]
+        r2 = radius * radius
+
+        count = 0
+        sep_u = sep_v = 0.0
+        sum_u = sum_v = 0.0
+        sum_vx = sum_vy = 0.0
+        for bucket in buckets:
+            for other in bucket:
+                if other is self:
+                    continue
+                du = self.u - other.u
+                dv = self.v - other.v
+                d2 = du * du + dv * dv
+                if d2 >= r2:
+                    continue
+
+                count += 1
+                sum_u += other.u
+                sum_v += other.v
+                sum_vx += other.vx
+                sum_vy += other.vy
+
+                d = d2 ** 0.5
+                if d == 0:
+                    du = random.uniform(-1, 1)
+                    dv = random.uniform(-1, 1)
+                    d = (du * du + dv * dv) ** 0.5
+                inv_t = 1 - min(d / separation_radius, 1)
+                sep_u += du / d * inv_t
+                sep_v += dv / d * inv_t
+
+        if not count:
+            return 0.0, 0.0, 0.0, 0.0, 0.0, 0.0
+
+        # --- cohesion: direction toward the neighbor centroid
+        coh_u = sum_u / count - self.u
+        coh_v = sum_v / count - self.v
+        length = (coh_u * coh_u + coh_v * coh_v) ** 0.5
         if length == 0:
-            return [0.0, 0.0]
-
-        return [vec[0]/length, vec[1]/length]
-
-    def _alignment_force(self, neighbors):
-        """
-        Compute alignment force based on average neighbor velocity.
-
-        Returns
-        -------
-        list[float]
-            Normalized velocity alignment vector in UV-space.
-        """
-        if not neighbors:
-            return [0.0, 0.0]
-
-        avg_vel_u = sum([o.velocity[0] for o in neighbors]) / len(neighbors)
-        avg_vel_v = sum([o.velocity[1] for o in neighbors]) / len(neighbors)
-
-        length = (avg_vel_u**2 + avg_vel_v**2) ** 0.5
+            coh_u = coh_v = 0.0
+        else:
+            coh_u /= length
+            coh_v /= length
+
+        # --- alignment: direction of the average neighbor velocity
+        ali_u = sum_vx / count
+        ali_v = sum_vy / count
+        length = (ali_u * ali_u + ali_v * ali_v) ** 0.5
         if length == 0:
-            return [0.0, 0.0]
+            ali_u = ali_v = 0.0
+        else:
+            ali_u /= length
+            ali_v /= length
 
-        return [avg_vel_u/length, avg_vel_v/length]
+        return sep_u, sep_v, coh_u, coh_v, ali_u, ali_v
 
     # ============================================================
     # STEERING
     # ============================================================
 
-    def steer(self, agents=None, radius=0.05,
+    def steer(self, agents=None, radius=NEIGHBOR_RADIUS,
               curv_w=1.0, slope_w=1.0,
               separation_w=10.0, cohesion_w=10.0,
-              alignment_w=1.0, max_speed=0.003):
+              alignment_w=1.0, max_speed=0.003, grid=None):
         """
         Update agent velocity by combining field forces and neighbor forces.
 
@@ -266,82 +363,515 @@ class GeoAgent(object):
             Weights for boid interaction forces.
         max_speed : float
             Maximum allowed velocity magnitude.
+        grid : dict, optional
+            Spatial hash of ``agents`` built by build_uv_hash with
+            cell size ``radius``, once per frame for the whole
+            population. The hash must match the current agent
+            positions: when agents are moved one after another, move
+            each to its new cell. Without it, all agents are scanned.
         """
 
-        # --- field-based forces
-        curv_force, speed_scale = self._curvature_force()
-        slope_force = self._slope_force()
+        # --- field-based forces; curvature has no direction and only
+        # damps the speed, so curv_w has no effect
+        speed_scale, fx, fy = self._field_sample()
 
-        self.velocity[0] += curv_w * curv_force[0] + slope_w * slope_force[0]
-        self.velocity[1] += curv_w * curv_force[1] + slope_w * slope_force[1]
+        self.vx += slope_w * fx
+        self.vy += slope_w * fy
 
-        self.velocity[0] *= speed_scale
-        self.velocity[1] *= speed_scale
+        self.vx *= speed_scale
+        self.vy *= speed_scale
 
-        # --- boid-style neighbor forces
-        if agents:
-            neighbors = self._neighbors_in_radius(agents, radius)
-            sep = self._separation_force(neighbors)
-            coh = self._cohesion_force(neighbors)
-            ali = self._alignment_force(neighbors)
+        # --- boid-style neighbor forces (skipped when all are weighted 0)
+        if agents and (separation_w or cohesion_w or alignment_w):
+            sep_u, sep_v, coh_u, coh_v, ali_u, ali_v = self._boid_forces(
+                agents, grid, radius, radius)
 
-            self.velocity[0] += separation_w * sep[0] + cohesion_w * coh[0] + alignment_w * ali[0]
-            self.velocity[1] += separation_w * sep[1] + cohesion_w * coh[1] + alignment_w * ali[1]
+            self.vx += separation_w * sep_u + cohesion_w * coh_u + alignment_w * ali_u
+            self.vy += separation_w * sep_v + cohesion_w * coh_v + alignment_w * ali_v
 
-        # --- clamp velocity magnitude
-        speed = (self.velocity[0]**2 + self.velocity[1]**2) ** 0.5
-        if speed > max_speed:
-            self.velocity[0] = self.velocity[0] / speed * max_speed
-            self.velocity[1] = self.velocity[1] / speed * max_speed
+        # --- clamp velocity magnitude (square root only when too fast)
+        speed2 = self.vx * self.vx + self.vy * self.vy
+        if speed2 > max_speed * max_speed:
+            speed = speed2 ** 0.5
+            self.vx = self.vx / speed * max_speed
+            self.vy = self.vy / speed * max_speed
 
     # ============================================================
     # UPDATE POSITION
     # ============================================================
 
-    def update(self):
+    def update_uv(self):
         """
-        Advance the agent in UV-space and update its 3D surface position.
+        Advance the agent in UV-space, clamped to the surface domain.
+
+        The 3D position is not updated; evaluate it once all agents
+        have moved (see evaluate_positions).
         """
-        self.u += self.velocity[0]
-        self.v += self.velocity[1]
+        self.u += self.vx
+        self.v += self.vy
 
         self.u = max(self.dom_u[0], min(self.dom_u[1], self.u))
         self.v = max(self.dom_v[0], min(self.dom_v[1], self.v))
 
-        pt = rs.EvaluateSurface(self.surface, self.u, self.v)
-        self.position = (pt.X, pt.Y, pt.Z)
+    def update(self):
+        """
+        Advance the agent in UV-space and update its 3D surface position.
+        """
+        self.update_uv()
+        self.position = self.surface.PointAt(self.u, self.v)
+
+# ============================================================
+# SURFACE EVALUATION
+# ============================================================
+
+def evaluate_positions(surface, u, v):
+    """
+    Evaluate 3D surface points for many UV coordinates in one pass.
+
+    Parameters
+    ----------
+    surface : Rhino.Geometry.Surface
+        Surface to evaluate.
+    u, v : sequence[float]
+        Parametric coordinates, one pair per point.
+
+    Returns
+    -------
+    list[Rhino.Geometry.Point3d]
+        Surface points, in the order of (u, v).
+    """
+    point_at = surface.PointAt
+    return [point_at(a, b) for a, b in zip(u, v)]
 
 # ============================================================
 # AGENT SPAWNER
 # ============================================================
 
-def build_agents_on_surface(n, surface,
-                            uv_grid, curvature_field,
-                            slope_mag, slope_vec, seed=None):
+def build_agents_on_surface(n, surface, uv_grid, fields, seed=None):
     """
     Create a population of agents randomly distributed over a surface.
 
+    A fields array is converted to nested lists once and shared by all
+    agents, since plain floats are faster to read one at a time.
+
     Returns
     -------
     list[GeoAgent]
         Initialized agent population.
     """
-    if seed is not None:
-        random.seed(seed)
+    rng = np.random.default_rng(seed)
 
     dom_u = rs.SurfaceDomain(surface, 0)
     dom_v = rs.SurfaceDomain(surface, 1)
 
-    agents = []
-    for _ in range(n):
-        u = random.uniform(dom_u[0], dom_u[1])
-        v = random.uniform(dom_v[0], dom_v[1])
-        agents.append(
-            GeoAgent(u, v, surface, dom_u, dom_v,
-                     uv_grid, curvature_field, slope_mag, slope_vec)
-        )
+    if isinstance(fields, np.ndarray):
+        fields = fields.tolist()
+
+    # --- Initial UV positions and velocities, drawn for all agents at once
+    u = rng.uniform(dom_u[0], dom_u[1], n).tolist()
+    v = rng.uniform(dom_v[0], dom_v[1], n).tolist()
+    vx = rng.uniform(-0.01, 0.01, n).tolist()
+    vy = rng.uniform(-0.01, 0.01, n).tolist()
+
+    return [
+        GeoAgent(u[k], v[k], surface, dom_u, dom_v, uv_grid, fields,
+                 velocity=(vx[k], vy[k]))
+        for k in range(n)
+    ]
+
+# ============================================================
+# AGENT SWARM (ARRAY STATE)
+# ============================================================
+
+def _normalize(x, y):
+    """
+    Normalize 2D vectors given as coordinate arrays.
+
+    Zero-length vectors are returned unchanged (as zero).
+    """
+    length = (x * x + y * y) ** 0.5
+    length[length == 0] = 1.0
+    return x / length, y / length
+
+class AgentSwarm(object):
+    """
+    Agent population stored as NumPy arrays, one entry per agent.
+
+    Follows the same rules as GeoAgent, but steers and moves the whole
+    population with array operations instead of per-agent method calls.
+    All agents are steered from the state at the start of the step.
+    GeoAgent objects are kept only as views for output (see ``agents``);
+    changes made to them downstream are read back before the next step.
+
+    The arrays can also live on a GPU: pass an array module with the
+    NumPy interface, e.g. ``xp=cupy``. The spatial hash and the dense
+    distance-matrix path only use array operations of ``xp``; the
+    optional KD-tree is used for NumPy arrays only.
+
+    State and fields are single precision when the surface domain lies
+    within [-1, 1] (e.g. reparameterized to [0, 1]): there, float32
+    resolves UV to better than 1e-7 against velocities around 1e-3, and
+    halves the memory every step has to read. On larger domains float32
+    would round ``u += vx`` visibly, so double precision is used. Values
+    are converted back to Python floats for the surface evaluation.
+    """
+
+    def __init__(self, n, surface, uv_grid, fields, seed=None, xp=np,
+                 dtype=None):
+        """
+        Randomly distribute ``n`` agents over a surface.
+
+        Parameters are the same as for build_agents_on_surface, plus:
+
+        xp : module
+            Array module holding the agent state and fields
+            (default NumPy).
+        dtype : dtype, optional
+            Floating point type of the agent state and fields (default
+            float32 if the surface domain lies within [-1, 1], else
+            float64).
+        """
+        rng = np.random.default_rng(seed)
+
+        # --- Random generator, also used after the initial draw to push
+        # apart agents on top of each other
+        self._rng = rng
+
+        # --- Geometry references
+        self.surface = surface
+        self.dom_u = rs.SurfaceDomain(surface, 0)
+        self.dom_v = rs.SurfaceDomain(surface, 1)
+        if dtype is None:
+            extent = max(abs(self.dom_u[0]), abs(self.dom_u[1]),
+                         abs(self.dom_v[0]), abs(self.dom_v[1]))
+            dtype = np.float32 if extent <= 1.0 else np.float64
+
+        # --- Field data: the (H, W, 4) array for the array step, and
+        # nested lists shared by the GeoAgent views
+        self.uv_grid = uv_grid
+        self.xp = xp
+        self._field_rows = np.asarray(fields).tolist()
+        self.fields = xp.asarray(fields, dtype=dtype)
+        self._nu = (len(uv_grid[0]) - 1) / (self.dom_u[1] - self.dom_u[0])
+        self._nv = (len(uv_grid) - 1) / (self.dom_v[1] - self.dom_v[0])
+
+        # --- Parametric state and UV velocity
+        self.u = xp.asarray(rng.uniform(self.dom_u[0], self.dom_u[1], n), dtype=dtype)
+        self.v = xp.asarray(rng.uniform(self.dom_v[0], self.dom_v[1], n), dtype=dtype)
+        self.vx = xp.asarray(rng.uniform(-0.01, 0.01, n), dtype=dtype)
+        self.vy = xp.asarray(rng.uniform(-0.01, 0.01, n), dtype=dtype)
+
+        # --- Original index of each agent; the arrays are reordered by
+        # spatial hash cell every step
+        self.ids = xp.arange(n)
+
+        # --- Persistent GeoAgent views, in the original agent order
+        # (created by the first call to agents()), and the u, v, vx, vy
+        # lists agents() last wrote to them
+        self._views = None
+        self._written = None
+
+    def __len__(self):
+        return len(self.u)
+
+    def _read_views(self):
+        """
+        Copy the state of the GeoAgent views back into the arrays.
+
+        Other components may steer or move the agents returned by
+        ``agents`` (e.g. agent_simulator.py); their state is taken over
+        so the swarm continues from it. The arrays are left alone while
+        the views still hold what ``agents`` wrote to them.
+        """
+        if self._views is None:
+            return
+        views = self._views
+        state = ([a.u for a in views], [a.v for a in views],
+                 [a.vx for a in views], [a.vy for a in views])
+        if state == self._written:
+            return
+        xp = self.xp
+        dtype = self.u.dtype
+        # views are in the original order, the arrays in cell order
+        self.u = xp.asarray(state[0], dtype=dtype)[self.ids]
+        self.v = xp.asarray(state[1], dtype=dtype)[self.ids]
+        self.vx = xp.asarray(state[2], dtype=dtype)[self.ids]
+        self.vy = xp.asarray(state[3], dtype=dtype)[self.ids]
+
+    def _sort_by_cell(self, radius):
+        """
+        Reorder the agents so that each spatial hash cell is contiguous.
+
+        Cells have size ``radius``, so every neighbor of an agent lies in
+        the 3x3 block of cells around it. Keeping the agents of one cell
+        next to each other also keeps neighbor lookups close in memory.
 
-    return agents
+        Returns
+        -------
+        cell_start : ndarray[int]
+            The agents of cell c are cell_start[c]:cell_start[c + 1].
+        n_cu, n_cv : int
+            Number of cells in U and V.
+        """
+        n_cu = int((self.dom_u[1] - self.dom_u[0]) / radius) + 1
+        n_cv = int((self.dom_v[1] - self.dom_v[0]) / radius) + 1
+        cell_start, order = build_cell_index(self.u - self.dom_u[0],
+                                             self.v - self.dom_v[0],
+                                             radius, n_cu, n_cv, self.xp)
+        self.u = self.u[order]
+        self.v = self.v[order]
+        self.vx = self.vx[order]
+        self.vy = self.vy[order]
+        self.ids = self.ids[order]
+        return cell_start, n_cu, n_cv
+
+    def _neighbor_pairs(self, radius, cell_start, n_cu, n_cv):
+        """
+        Find all ordered pairs of agents closer than ``radius`` in UV-space.
+
+        Candidate pairs come from the 3x3 block of cells around each
+        agent; agents must be sorted by cell (see ``_sort_by_cell``). Only array operations of ``xp`` are used.
+
+        Returns
+        -------
+        i, j : ndarray[int]
+            Agent indices; j is a neighbor of i.
+        du, dv : ndarray[float]
+            UV offsets u[i] - u[j] and v[i] - v[j].
+        d2 : ndarray[float]
+            Squared UV distances.
+        """
+        xp = self.xp
+        n = len(self.u)
+
+        # --- cells of one row (same ci) are contiguous in the sorted
+        # arrays, so the cells around each agent are one slice per row,
+        # as (n, width) arrays of first and end offsets
+        offsets = xp.arange(-1, 2)
+        width = 3
+        ci = ((self.u - self.dom_u[0]) / radius).astype(np.intp)
+        cj = ((self.v - self.dom_v[0]) / radius).astype(np.intp)
+        ci = ci[:, None] + offsets
+        lo = xp.maximum(cj - 1, 0)[:, None]
+        hi = xp.minimum(cj + 1, n_cv - 1)[:, None]
+        valid = (ci >= 0) & (ci < n_cu)
+        row = xp.where(valid, ci, 0) * n_cv
+        start = cell_start[row + lo]
+        count = xp.where(valid, cell_start[row + hi + 1] - start, 0)
+
+        # --- one candidate pair per agent in each non-empty slice; each
+        # pair finds its slice from a running count of slice starts
+        blocks = xp.flatnonzero(count)
+        size = count.ravel()[blocks]
+        first = xp.cumsum(size) - size
+        total = int(first[-1] + size[-1]) if len(blocks) else 0
+        mark = xp.zeros(total, dtype=np.intp)
+        mark[first] = 1
+        b = xp.cumsum(mark) - 1
+        i = (blocks // width)[b]
+        j = xp.arange(total) + (start.ravel()[blocks] - first)[b]
+
+        du = self.u[i] - self.u[j]
+        dv = self.v[i] - self.v[j]
+        d2 = du * du + dv * dv
+        keep = (d2 < radius * radius) & (i != j)
+        return i[keep], j[keep], du[keep], dv[keep], d2[keep]
+
+    def _tree_pairs(self, radius):
+        """
+        Find all ordered pairs of agents closer than ``radius`` in UV-space
+        with a KD-tree (requires SciPy).
+
+        Returns
+        -------
+        i, j, du, dv, d2
+            As for ``_neighbor_pairs``.
+        """
+        tree = cKDTree(np.column_stack((self.u, self.v)))
+        pairs = tree.query_pairs(radius, output_type="ndarray")
+        # each unordered pair counts for both agents
+        i = np.concatenate((pairs[:, 0], pairs[:, 1]))
+        j = np.concatenate((pairs[:, 1], pairs[:, 0]))
+
+        du = self.u[i] - self.u[j]
+        dv = self.v[i] - self.v[j]
+        d2 = du * du + dv * dv
+        keep = d2 < radius * radius
+        return i[keep], j[keep], du[keep], dv[keep], d2[keep]
+
+    def _dense_neighbors(self, radius):
+        """
+        Find neighbor pairs from the full matrix of squared UV distances.
+
+        Returns
+        -------
+        i, j, du, dv, d2
+            As for ``_neighbor_pairs``.
+        mask : ndarray[bool]
+            N x N matrix, True where j is a neighbor of i.
+        """
+        du = self.u[:, None] - self.u
+        dv = self.v[:, None] - self.v
+        d2 = du * du + dv * dv
+        mask = d2 < radius * radius
+        self.xp.fill_diagonal(mask, False)
+        i, j = self.xp.nonzero(mask)
+        return i, j, du[mask], dv[mask], d2[mask], mask
+
+    def _boid_forces(self, radius, cell_start, n_cu, n_cv,
+                     separation_radius=0.05):
+        """
+        Compute separation, cohesion and alignment for every agent.
+
+        Up to DENSE_MAX_AGENTS agents, cohesion and alignment sums are
+        taken as matrix products with the neighbor mask; larger
+        populations sum over the pairs found with a KD-tree if SciPy is
+        available and the arrays are NumPy arrays, otherwise through the
+        spatial hash.
+
+        Returns
+        -------
+        tuple[ndarray]
+            sep_u, sep_v, coh_u, coh_v, ali_u, ali_v in UV-space.
+        """
+        xp = self.xp
+        n = len(self.u)
+        if n <= DENSE_MAX_AGENTS:
+            i, j, du, dv, d2, mask = self._dense_neighbors(radius)
+            # (sums in double precision: m @ u - count * u cancels)
+            m = mask.astype(float)
+            count = m.sum(1)
+            # sum over neighbors of (u_j - u_i), i.e. toward the centroid
+            to_u = m @ self.u - count * self.u
+            to_v = m @ self.v - count * self.v
+            vel_u = m @ self.vx
+            vel_v = m @ self.vy
+        else:
+            if cKDTree is not None and xp is np:
+                i, j, du, dv, d2 = self._tree_pairs(radius)
+            else:
+                i, j, du, dv, d2 = self._neighbor_pairs(radius, cell_start,
+                                                        n_cu, n_cv)
+            to_u = -xp.bincount(i, du, n)
+            to_v = -xp.bincount(i, dv, n)
+            vel_u = xp.bincount(i, self.vx[j], n)
+            vel_v = xp.bincount(i, self.vy[j], n)
+
+        # --- separation: push apart, stronger when closer; agents on
+        # top of each other are pushed in a random direction, drawn from
+        # the swarm's seeded generator
+        d = xp.sqrt(d2)
+        same = d == 0
+        if same.any():
+            k = int(same.sum())
+            du[same] = xp.asarray(self._rng.uniform(-1, 1, k), dtype=du.dtype)
+            dv[same] = xp.asarray(self._rng.uniform(-1, 1, k), dtype=dv.dtype)
+            d[same] = xp.sqrt(du[same] ** 2 + dv[same] ** 2)
+        w = (1 - xp.minimum(d / separation_radius, 1)) / d
+        sep_u = xp.bincount(i, w * du, n)
+        sep_v = xp.bincount(i, w * dv, n)
+
+        # --- cohesion: direction toward the neighbor centroid
+        coh_u, coh_v = _normalize(to_u, to_v)
+
+        # --- alignment: direction of the average neighbor velocity
+        ali_u, ali_v = _normalize(vel_u, vel_v)
+
+        return sep_u, sep_v, coh_u, coh_v, ali_u, ali_v
+
+    def step(self, radius=NEIGHBOR_RADIUS,
+             curv_w=1.0, slope_w=1.0,
+             separation_w=10.0, cohesion_w=10.0,
+             alignment_w=1.0, max_speed=0.003):
+        """
+        Steer and move all agents by one timestep.
+
+        Parameters are the same as for GeoAgent.steer.
+        """
+        self._read_views()
+
+        xp = self.xp
+        cell_start, n_cu, n_cv = self._sort_by_cell(radius)
+
+        # --- neighbor forces are computed from the velocities at the
+        # start of the step, before any agent is changed
+        boids = separation_w or cohesion_w or alignment_w
+        if boids:
+            sep_u, sep_v, coh_u, coh_v, ali_u, ali_v = self._boid_forces(
+                radius, cell_start, n_cu, n_cv)
+
+        # --- field-based forces; curvature has no direction and only
+        # damps the speed, so curv_w has no effect (as in GeoAgent)
+        sample = self.fields[((self.v - self.dom_v[0]) * self._nv).astype(np.intp),
+                             ((self.u - self.dom_u[0]) * self._nu).astype(np.intp)]
+        speed_scale = 1.0 - sample[:, 0]
+        mag = sample[:, 1]
+
+        self.vx += slope_w * sample[:, 2] * mag
+        self.vy += slope_w * sample[:, 3] * mag
+
+        self.vx *= speed_scale
+        self.vy *= speed_scale
+
+        # --- boid-style neighbor forces
+        if boids:
+            self.vx += separation_w * sep_u + cohesion_w * coh_u + alignment_w * ali_u
+            self.vy += separation_w * sep_v + cohesion_w * coh_v + alignment_w * ali_v
+
+        # --- clamp velocity magnitude without branching: the scale
+        # factor is exactly 1 for agents within max_speed (as long as
+        # max_speed is rounded to the state's precision first)
+        max_speed = self.vx.dtype.type(max_speed)
+        speed2 = self.vx * self.vx + self.vy * self.vy
+        scale = max_speed / xp.sqrt(xp.maximum(speed2, max_speed * max_speed))
+        self.vx *= scale
+        self.vy *= scale
+
+        # --- move, clamped to the surface domain
+        self.u += self.vx
+        self.v += self.vy
+        xp.clip(self.u, self.dom_u[0], self.dom_u[1], out=self.u)
+        xp.clip(self.v, self.dom_v[0], self.dom_v[1], out=self.v)
+
+    def agents(self):
+        """
+        GeoAgent views of the current array state.
+
+        The same GeoAgent objects are returned on every call, updated
+        in place, so they keep their identity across solutions. Changes
+        made to them are read back at the start of the next ``step``.
+
+        Returns
+        -------
+        list[GeoAgent]
+            One agent per array entry, in the original agent order, with
+            position evaluated on the surface.
+        """
+        order = self.xp.empty_like(self.ids)
+        order[self.ids] = self.xp.arange(len(self.ids))
+        u = self.u[order].tolist()
+        v = self.v[order].tolist()
+        vx = self.vx[order].tolist()
+        vy = self.vy[order].tolist()
+        positions = evaluate_positions(self.surface, u, v)
+
+        if self._views is None:
+            self._views = [
+                GeoAgent(u_k, v_k, self.surface, self.dom_u, self.dom_v,
+                         self.uv_grid, self._field_rows,
+                         velocity=(vx_k, vy_k), position=pt)
+                for u_k, v_k, vx_k, vy_k, pt in zip(u, v, vx, vy, positions)
+            ]
+        else:
+            for a, u_k, v_k, vx_k, vy_k, pt in zip(self._views, u, v,
+                                                   vx, vy, positions):
+                a.u = u_k
+                a.v = v_k
+                a.vx = vx_k
+                a.vy = vy_k
+                a.position = pt
+        self._written = (u, v, vx, vy)
+        return self._views
 
 # ============================================================
 # GRASSHOPPER COMPONENT
@@ -365,21 +895,19 @@ class MyComponent(Grasshopper.Kernel.GH_ScriptInstance):
         Grasshopper execution entry point.
         """
 
-        if reset or not hasattr(self, "agents"):
-            self.agents = build_agents_on_surface(
-                N, S, uv_grid, curvature, slope_mag, slope_vec
+        # --- the fields are packed into one array once per population
+        if reset or not hasattr(self, "swarm"):
+            self.swarm = AgentSwarm(
+                N, S, uv_grid, pack_fields(curvature, slope_mag, slope_vec)
             )
 
-        # --- update simulation
-        for a in self.agents:
-            a.steer(self.agents)
-            a.update()
+        # --- update simulation (all agents at once)
+        self.swarm.step()
 
-        OUT_agents = self.agents
-        OUT_positions = [
-            rg.Point3d(a.position[0], a.position[1], a.position[2])
-            for a in self.agents
-        ]
+        # --- the same GeoAgent views on every solution; changes made to
+        # them downstream are read back by the next step()
+        OUT_agents = self.swarm.agents()
+        OUT_positions = [a.position for a in OUT_agents]
 
         return OUT_agents, OUT_positions
 
@@ -38,31 +38,66 @@ Each agent updates its velocity and position based on:
 # coh    : cohesion force weight
 # ali    : alignment force weight
 # max_speed : upper bound on UV velocity magnitude
+# show_vectors : build OUT_vectors (velocity lines) only when True
+#                (optional input, on if the component does not have it)
 '''
+show_vectors = globals().get("show_vectors", True)
+
+'''
+Spatial hash of the agents by UV cell (cell size = rad), built once
+per timestep. Each agent then only checks the 3x3 cells around it
+instead of the whole population (same layout as build_uv_hash).
+Agents move one after another, so an agent that crosses into another
+cell is moved to that cell right away; later agents then see it where
+it is, as with a scan over the whole population.
+A radius of 0 or less has no neighbors: no hash is built and the
+boid forces are skipped (the agents are not passed to steer).
+'''
+neighbors = agents if rad > 0 else None
+grid = {}
+if neighbors:
+    for a in agents:
+        grid.setdefault((int(a.u / rad), int(a.v / rad)), []).append(a)
 
 for a in agents:
+    if neighbors:
+        key = (int(a.u / rad), int(a.v / rad))
     '''
     Update agent velocity by combining:
     - environmental field forces (curvature + slope)
     - local neighbor forces (separation, cohesion, alignment)
     
-    Passing the full agent list enables neighborhood queries
-    within the specified UV radius.
+    Passing the full agent list and its spatial hash enables
+    neighborhood queries within the specified UV radius.
 '''
     a.steer(
-        agents=agents,       # full agent population
+        agents=neighbors,    # full agent population (None: no boids)
         radius=rad,          # neighbor search radius
         curv_w=curv_w,       # curvature damping weight
         slope_w=slope_w,     # slope direction weight
         separation_w=sep,    # repulsion from nearby agents
         cohesion_w=coh,      # attraction toward neighbor centroid
         alignment_w=ali,     # velocity alignment with neighbors
-        max_speed=max_speed  # clamp to prevent instability
+        max_speed=max_speed, # clamp to prevent instability
+        grid=grid            # spatial hash for neighbor lookup
     )
 
-    # Advance the agent in UV-space and update its 3D position
+    # Advance the agent in UV-space (its 3D position is evaluated
+    # below, once all agents have moved)
     # UV coordinates are clamped to the surface domain internally
-    a.update()
+    a.update_uv()
+
+    # Keep the spatial hash up to date with the agent's new cell
+    if neighbors:
+        new_key = (int(a.u / rad), int(a.v / rad))
+        if new_key != key:
+            grid[key].remove(a)
+            grid.setdefault(new_key, []).append(a)
+
+# --- 3D positions, evaluated on the surface in one pass after all
+# agents have moved
+for a in agents:
+    a.position = a.surface.PointAt(a.u, a.v)
 
 # ============================================================
 # GRASSHOPPER OUTPUTS
@@ -73,24 +108,26 @@ for a in agents:
 # vectors are visualized as lines originating at each agent.
 '''
 
-#  agent positions (3D points on the surface)
-OUT_positions = [
-    rg.Point3d(a.position[0], a.position[1], a.position[2])
-    for a in agents
-]
+#  agent positions (3D points on the surface, stored on each agent)
+OUT_positions = [a.position for a in agents]
 '''
 --- agent velocity vectors
 These lines indicate both direction and relative magnitude
 of motion in UV-space, projected into 3D.
+They are only built when requested, as they add a point and
+a line per agent per timestep.
 '''
-OUT_vectors = [
-    rg.Line(
-        rg.Point3d(*a.position),
-        rg.Point3d(
-            a.position[0] + a.velocity[0],
-            a.position[1] + a.velocity[1],
-            a.position[2]
+if show_vectors:
+    OUT_vectors = [
+        rg.Line(
+            a.position,
+            rg.Point3d(
+                a.position.X + a.vx,
+                a.position.Y + a.vy,
+                a.position.Z
+            )
         )
-    )
-    for a in agents
-]
+        for a in agents
+    ]
+else:
+    OUT_vectors = []